@@ -3,29 +3,82 @@
 
 from __future__ import annotations
 
-from dataclasses import asdict
-from datetime import datetime, timezone
+from typing import Any
 
-from flask import Flask, jsonify, request
+from flask import Flask, Response, jsonify, request
+from flask.json.provider import DefaultJSONProvider
 from flask_cors import CORS
 
-from main import APP_VERSION, HAS_FHE, run_once
+from main import APP_VERSION, HAS_FHE, HAS_ORJSON, LoanProfile, run_once, utc_now_iso
+
+if HAS_ORJSON:
+    import orjson
+
+
+class ORJSONProvider(DefaultJSONProvider):
+    """Flask JSON provider backed by orjson for request parsing and jsonify."""
+
+    def dumps(self, obj: Any, **kwargs: Any) -> str:
+        option = orjson.OPT_NON_STR_KEYS
+        if kwargs.get("sort_keys", self.sort_keys):
+            option |= orjson.OPT_SORT_KEYS
+        if kwargs.get("indent"):
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(obj, default=self.default, option=option).decode("utf-8")
+
+    def loads(self, s: str | bytes, **kwargs: Any) -> Any:
+        return orjson.loads(s)
+
 
 app = Flask(__name__)
+if HAS_ORJSON:
+    app.json = ORJSONProvider(app)
 CORS(app)
 
+_POST_QUANTUM_STACK = (
+    "CRYSTALS-Kyber (KEM path)",
+    "CRYSTALS-Dilithium (signature path)",
+    "SHA3-256 (hash hardening)",
+)
+
+_THREAT_PROFILES = {
+    "grover": ("elevated", "Abnormal key-search pattern resembles Grover-style acceleration"),
+    "shor": ("critical", "Factoring/signature-break pattern resembles Shor-style capability"),
+}
+
+# (min credit score, max debt-to-income, max risk score, decision, reason), checked in order.
+_DECISION_TIERS = (
+    (720, 35, 45, "approve", "Strong credit + healthy debt-to-income profile"),
+    (640, 45, 70, "review", "Borderline profile; manual review recommended"),
+)
+_DECLINE_DECISION = ("decline", "Risk profile is above current pre-approval threshold")
+
+# mode -> (runtime factor, overhead bonus %, security response, defense profile)
+_SECURITY_MODE_EFFECTS = {
+    "HYBRID": (1.12, 300, "Hybrid defense enabled (classical + post-quantum checks)", "hybrid-defense-v1"),
+    "POST_QUANTUM": (1.35, 800, "Post-quantum hardening active (Kyber + Dilithium path)", "post-quantum-defense-v1"),
+}
+# NORMAL and unknown modes leave runtime/overhead untouched.
+_NORMAL_MODE_EFFECTS = (None, 0, "Standard monitoring mode", "normal-monitoring-v1")
+
+# /api/status never changes while the process runs; encode it once.
+_STATUS_BODY = app.json.dumps(
+    {
+        "fhe_available": HAS_FHE,
+        "version": APP_VERSION,
+        "library": "Microsoft SEAL (TenSEAL)" if HAS_FHE else "None",
+        "status": "ready",
+    }
+) + "\n"
+
 
 def derive_preapproval_decision(credit_score: int, debt_to_income: float, risk_score: int) -> dict:
     """Return a simple private pre-approval decision signal."""
-    if credit_score >= 720 and debt_to_income <= 35 and risk_score <= 45:
-        decision = "approve"
-        reason = "Strong credit + healthy debt-to-income profile"
-    elif credit_score >= 640 and debt_to_income <= 45 and risk_score <= 70:
-        decision = "review"
-        reason = "Borderline profile; manual review recommended"
-    else:
-        decision = "decline"
-        reason = "Risk profile is above current pre-approval threshold"
+    decision, reason = _DECLINE_DECISION
+    for min_credit, max_dti, max_risk, tier_decision, tier_reason in _DECISION_TIERS:
+        if credit_score >= min_credit and debt_to_income <= max_dti and risk_score <= max_risk:
+            decision, reason = tier_decision, tier_reason
+            break
 
     return {
         "preapproval_decision": decision,
@@ -57,16 +110,15 @@ def simulate_quantum_threat(attack_type: str, current_mode: str) -> dict:
     attack = (attack_type or "").strip().lower()
     previous_mode = (current_mode or "NORMAL").strip().upper()
 
+    profile = _THREAT_PROFILES.get(attack)
+    if profile is None:
+        raise ValueError("attackType must be 'grover' or 'shor'")
+
+    threat_level, detector_summary = profile
     if attack == "grover":
         new_mode = "POST_QUANTUM" if previous_mode == "HYBRID" else "HYBRID"
-        threat_level = "elevated"
-        detector_summary = "Abnormal key-search pattern resembles Grover-style acceleration"
-    elif attack == "shor":
-        new_mode = "POST_QUANTUM"
-        threat_level = "critical"
-        detector_summary = "Factoring/signature-break pattern resembles Shor-style capability"
     else:
-        raise ValueError("attackType must be 'grover' or 'shor'")
+        new_mode = "POST_QUANTUM"
 
     return {
         "attack_type": attack,
@@ -76,12 +128,8 @@ def simulate_quantum_threat(attack_type: str, current_mode: str) -> dict:
         "new_mode": new_mode,
         "detector_summary": detector_summary,
         "auto_response": f"Security mode switched from {previous_mode} to {new_mode}",
-        "post_quantum_stack": [
-            "CRYSTALS-Kyber (KEM path)",
-            "CRYSTALS-Dilithium (signature path)",
-            "SHA3-256 (hash hardening)",
-        ],
-        "timestamp_utc": datetime.now(timezone.utc).isoformat(),
+        "post_quantum_stack": _POST_QUANTUM_STACK,
+        "timestamp_utc": utc_now_iso(),
     }
 
 
@@ -91,36 +139,23 @@ def apply_security_mode_effects(result_dict: dict, security_mode: str) -> None:
     benchmark = result_dict["benchmark"]
     compute_result = result_dict["compute_result"]
 
-    runtime_ms = int(benchmark.get("runtime_ms", 0))
-    overhead = int(compute_result.get("performance_overhead_percent", 0))
-
-    if mode == "HYBRID":
-        benchmark["runtime_ms"] = int(runtime_ms * 1.12)
-        compute_result["performance_overhead_percent"] = overhead + 300
-        compute_result["security_response"] = "Hybrid defense enabled (classical + post-quantum checks)"
-        compute_result["defense_profile"] = "hybrid-defense-v1"
-    elif mode == "POST_QUANTUM":
-        benchmark["runtime_ms"] = int(runtime_ms * 1.35)
-        compute_result["performance_overhead_percent"] = overhead + 800
-        compute_result["security_response"] = "Post-quantum hardening active (Kyber + Dilithium path)"
-        compute_result["defense_profile"] = "post-quantum-defense-v1"
-    else:
-        compute_result["security_response"] = "Standard monitoring mode"
-        compute_result["defense_profile"] = "normal-monitoring-v1"
+    runtime_factor, overhead_bonus, security_response, defense_profile = _SECURITY_MODE_EFFECTS.get(
+        mode, _NORMAL_MODE_EFFECTS
+    )
+    if runtime_factor is not None:
+        benchmark["runtime_ms"] = int(int(benchmark.get("runtime_ms", 0)) * runtime_factor)
+        compute_result["performance_overhead_percent"] = (
+            int(compute_result.get("performance_overhead_percent", 0)) + overhead_bonus
+        )
+    compute_result["security_response"] = security_response
+    compute_result["defense_profile"] = defense_profile
 
     compute_result["security_mode"] = mode
 
 
 @app.route("/api/status", methods=["GET"])
 def status():
-    return jsonify(
-        {
-            "fhe_available": HAS_FHE,
-            "version": APP_VERSION,
-            "library": "Microsoft SEAL (TenSEAL)" if HAS_FHE else "None",
-            "status": "ready",
-        }
-    )
+    return Response(_STATUS_BODY, mimetype="application/json")
 
 
 @app.route("/api/compute", methods=["POST"])
@@ -144,17 +179,17 @@ def compute():
             annual_income = float(loan_profile["annualIncome"])
             purpose = str(loan_profile.get("purpose", "general")).strip() or "general"
 
-            # Keep raw values in-memory only; serialize to one transient sensitive string.
-            sensitive_input = (
-                f"loan::{credit_score}::{debt_to_income:.2f}::{annual_income:.2f}::{purpose}"
-            )
+            # Keep raw values in-memory only; run_once takes them without re-parsing.
+            sensitive_input = None
+            profile = LoanProfile.from_values(credit_score, debt_to_income, annual_income, purpose)
         else:
+            profile = None
             sensitive_input = data.get("sensitiveInput", "")
             if not sensitive_input:
                 return jsonify({"success": False, "error": "sensitiveInput or loanProfile required"}), 400
 
-        result = run_once(sensitive_input, scenario, force_fallback)
-        result_dict = asdict(result)
+        result = run_once(sensitive_input, scenario, force_fallback, loan_profile=profile)
+        result_dict = result.to_dict()
 
         if loan_profile:
             decision = derive_preapproval_decision(
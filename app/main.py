@@ -4,16 +4,22 @@
 from __future__ import annotations
 
 import argparse
+import atexit
+import functools
 import hashlib
+import itertools
 import json
+import os
+import re
+import secrets
 import shutil
 import subprocess
 import tempfile
+import threading
 import time
-from dataclasses import asdict, dataclass
-from datetime import datetime, timezone
+from dataclasses import dataclass
 from pathlib import Path
-from typing import Any
+from typing import Any, Callable
 
 try:
     import tenseal as ts
@@ -22,8 +28,16 @@ except ImportError:
     HAS_FHE = False
     print("WARNING: TenSEAL not installed. Run: pip install tenseal numpy")
 
+try:
+    import orjson
+    HAS_ORJSON = True
+except ImportError:
+    HAS_ORJSON = False
+
 APP_VERSION = "2.1.0-SEAL-FHE-SNARKJS"
 CIRCUIT_VERSION = "fhe-seal-v1"
+FHE_POLY_MODULUS_DEGREE = 8192
+FHE_SLOT_COUNT = FHE_POLY_MODULUS_DEGREE // 2
 REAL_ZK_CIRCUIT_VERSION = "loan-signal-groth16-v1"
 
 ZK_ROOT = Path(__file__).resolve().parent.parent / "zk"
@@ -31,6 +45,15 @@ ZK_ARTIFACTS = ZK_ROOT / "artifacts"
 ZK_WASM = ZK_ARTIFACTS / "loan_signal_js" / "loan_signal.wasm"
 ZK_ZKEY = ZK_ARTIFACTS / "loan_signal_final.zkey"
 ZK_VKEY = ZK_ARTIFACTS / "verification_key.json"
+ZK_WORKER = ZK_ROOT / "worker.js"
+
+# Keep snarkjs CLI scratch files in RAM where a tmpfs is available (Linux).
+ZK_TMP_DIR = "/dev/shm" if os.access("/dev/shm", os.W_OK) else None
+
+# snarkjs CLI arguments; artifact paths are fixed for the process lifetime.
+ZK_WASM_ARG = str(ZK_WASM)
+ZK_ZKEY_ARG = str(ZK_ZKEY)
+ZK_VKEY_ARG = str(ZK_VKEY)
 
 
 @dataclass
@@ -41,6 +64,15 @@ class BenchmarkMetrics:
     computation_time_ms: int
     proof_time_ms: int
 
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "runtime_ms": self.runtime_ms,
+            "compute_mode": self.compute_mode,
+            "encryption_time_ms": self.encryption_time_ms,
+            "computation_time_ms": self.computation_time_ms,
+            "proof_time_ms": self.proof_time_ms,
+        }
+
 
 @dataclass
 class ProofArtifact:
@@ -51,6 +83,49 @@ class ProofArtifact:
     crypto_primitives_used: list[str]
     fhe_parameters: dict[str, Any]
 
+    def to_dict(self) -> dict[str, Any]:
+        return {
+            "proof_hash": self.proof_hash,
+            "verification_result": self.verification_result,
+            "circuit_version": self.circuit_version,
+            "input_fingerprint": self.input_fingerprint,
+            "crypto_primitives_used": self.crypto_primitives_used,
+            "fhe_parameters": self.fhe_parameters,
+        }
+
+
+@dataclass(frozen=True)
+class LoanProfile:
+    """Validated loan fields handed to run_once without a loan::... string round-trip."""
+
+    credit_score: int
+    dti_bp: int
+    annual_income: float
+    purpose: str
+
+    @classmethod
+    def from_values(
+        cls, credit_score: int, debt_to_income: float, annual_income: float, purpose: str
+    ) -> LoanProfile:
+        """Build from API units; debt_to_income is a percentage, stored as basis points.
+
+        The percentage is quantised to two decimals first, matching the
+        ``loan::...::{debt_to_income:.2f}::...`` string the API used to build.
+        """
+        return cls(
+            credit_score=credit_score,
+            dti_bp=dti_to_basis_points(float(f"{debt_to_income:.2f}")),
+            annual_income=annual_income,
+            purpose=purpose,
+        )
+
+    def canonical_input(self) -> str:
+        """Stable stand-in for sensitive_input when fingerprinting and seeding."""
+        return repr(("loan", self.credit_score, self.dti_bp, self.annual_income, self.purpose))
+
+    def circuit_inputs(self) -> tuple[int, int]:
+        return clamp_loan_inputs(self.credit_score, self.dti_bp)
+
 
 @dataclass
 class RunResult:
@@ -63,51 +138,97 @@ class RunResult:
     benchmark: BenchmarkMetrics
     proof: ProofArtifact
 
+    def to_dict(self) -> dict[str, Any]:
+        """Plain-dict view matching dataclasses.asdict key order, without the deep copy."""
+        return {
+            "run_id": self.run_id,
+            "timestamp_utc": self.timestamp_utc,
+            "scenario": self.scenario,
+            "compute_result": self.compute_result,
+            "risk_context": self.risk_context,
+            "trust_model_comparison": self.trust_model_comparison,
+            "benchmark": self.benchmark.to_dict(),
+            "proof": self.proof.to_dict(),
+        }
+
 
 def utc_now_iso() -> str:
-    return datetime.now(timezone.utc).isoformat()
+    """Same layout as datetime.now(timezone.utc).isoformat(), without building datetimes."""
+    now_ns = time.time_ns()
+    seconds, nanos = divmod(now_ns, 1_000_000_000)
+    return f"{time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime(seconds))}.{nanos // 1000:06d}+00:00"
 
 
 def stable_hash(payload: str) -> str:
-    return hashlib.sha3_256(payload.encode("utf-8")).hexdigest()
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+@functools.lru_cache(maxsize=256)
+def scenario_hash(scenario: str) -> str:
+    """Scenario names are public labels; unlike sensitive inputs, their hashes may be cached."""
+    return stable_hash(scenario)
 
 
 def compute_input_fingerprint(sensitive_input: str) -> str:
     return stable_hash(f"fingerprint::{sensitive_input}")
 
 
+# Credit and DTI fields of loan::<credit>::<dti>::<income>[::<purpose>]; income is required but unused.
+LOAN_PROFILE_RE = re.compile(r"loan::(.*?)::(.*?)::", re.DOTALL)
+
+
+def dti_to_basis_points(debt_to_income: float) -> int:
+    """Shared by parse_loan_profile and LoanProfile so both paths round identically."""
+    return int(round(debt_to_income * 100))
+
+
 def parse_loan_profile(sensitive_input: str) -> tuple[int, int] | None:
     """Parse loan::<credit>::<dti>::<income>::<purpose> into (credit, dti_bp)."""
-    if not sensitive_input.startswith("loan::"):
-        return None
-
-    parts = sensitive_input.split("::")
-    if len(parts) < 4:
+    match = LOAN_PROFILE_RE.match(sensitive_input)
+    if match is None:
         return None
 
     try:
-        credit_score = int(float(parts[1]))
-        dti_bp = int(round(float(parts[2]) * 100))
+        credit_score = int(float(match.group(1)))
+        dti_bp = dti_to_basis_points(float(match.group(2)))
     except (TypeError, ValueError):
         return None
 
     return credit_score, dti_bp
 
 
-def derive_loan_inputs(sensitive_input: str, scenario: str) -> tuple[int, int]:
-    """Always produce valid private inputs for the loan_signal ZK circuit."""
+def input_seed(sensitive_input: str) -> int:
+    """Deterministic 32-bit seed shared by the FHE input and the ZK fallback inputs."""
+    return int(stable_hash(sensitive_input)[:8], 16)
+
+
+def clamp_loan_inputs(credit_score: int, dti_bp: int) -> tuple[int, int]:
+    return max(300, min(850, credit_score)), max(0, min(10000, dti_bp))
+
+
+def derive_loan_inputs(
+    sensitive_input: str,
+    scenario: str,
+    seed: Callable[[], int] | None = None,
+) -> tuple[int, int]:
+    """Always produce valid private inputs for the loan_signal ZK circuit.
+
+    ``seed`` lazily supplies input_seed(sensitive_input) so callers can share one hash.
+    """
     parsed = parse_loan_profile(sensitive_input)
     if parsed:
-        credit_score, dti_bp = parsed
-        return max(300, min(850, credit_score)), max(0, min(10000, dti_bp))
+        return clamp_loan_inputs(*parsed)
 
     # Fallback deterministic derivation for non-loan scenarios.
-    credit_score = 300 + (int(stable_hash(sensitive_input)[:8], 16) % 551)
-    dti_bp = int(stable_hash(scenario)[:6], 16) % 10001
+    seed_value = seed() if seed is not None else input_seed(sensitive_input)
+    credit_score = 300 + (seed_value % 551)
+    dti_bp = int(scenario_hash(scenario)[:6], 16) % 10001
     return credit_score, dti_bp
 
 
+@functools.lru_cache(maxsize=1)
 def real_zk_ready() -> bool:
+    """Check snarkjs + circuit artifacts once; restart the process after installing them."""
     return (
         shutil.which("snarkjs") is not None
         and ZK_WASM.exists()
@@ -120,26 +241,138 @@ def run_cmd(args: list[str]) -> subprocess.CompletedProcess:
     return subprocess.run(args, check=True, text=True, capture_output=True)
 
 
+_zk_worker: subprocess.Popen | None = None
+_zk_worker_lock = threading.Lock()
+_zk_worker_ids = itertools.count(1)
+# Set once the worker fails to load snarkjs; the CLI path is used from then on.
+_zk_worker_disabled = False
+
+
+def usable_cpu_count() -> int:
+    """CPUs this process may run on (affinity/cgroup cpusets), not the host total."""
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0)) or 1
+    return os.cpu_count() or 1
+
+
+# The worker proves one request at a time; cap CLI fallback proofs at one Node process per core.
+_zk_cli_slots = threading.BoundedSemaphore(usable_cpu_count())
+
+
+def _stop_zk_worker() -> None:
+    global _zk_worker
+    if _zk_worker is not None and _zk_worker.poll() is None:
+        _zk_worker.stdin.close()
+        try:
+            _zk_worker.wait(timeout=5)
+        except subprocess.TimeoutExpired:
+            _zk_worker.kill()
+    _zk_worker = None
+
+
+atexit.register(_stop_zk_worker)
+
+
+@functools.lru_cache(maxsize=1)
+def zk_worker_available() -> bool:
+    """Check node + zk/worker.js once, like real_zk_ready()."""
+    return shutil.which("node") is not None and ZK_WORKER.exists()
+
+
+def _start_zk_worker() -> subprocess.Popen:
+    """Start zk/worker.js and wait for its ready line; disable the worker if it cannot load snarkjs."""
+    global _zk_worker_disabled
+    worker = subprocess.Popen(
+        ["node", str(ZK_WORKER)],
+        stdin=subprocess.PIPE,
+        stdout=subprocess.PIPE,
+        text=True,
+        encoding="utf-8",
+    )
+    try:
+        ready = json.loads(worker.stdout.readline() or "{}").get("ready")
+    except ValueError:
+        ready = False
+    if not ready:
+        _zk_worker_disabled = True
+        worker.kill()
+        worker.wait()
+        raise RuntimeError("snarkjs worker failed to start; using snarkjs CLI for this process")
+    return worker
+
+
+def _zk_worker_request(payload: dict[str, Any]) -> dict[str, Any]:
+    """Send one request to the persistent snarkjs worker (zk/worker.js)."""
+    global _zk_worker
+    with _zk_worker_lock:
+        if _zk_worker is None or _zk_worker.poll() is not None:
+            _zk_worker = _start_zk_worker()
+
+        request_id = next(_zk_worker_ids)
+        try:
+            _zk_worker.stdin.write(json.dumps({**payload, "id": request_id}) + "\n")
+            _zk_worker.stdin.flush()
+            response = json.loads(_zk_worker.stdout.readline())
+            if response.get("id") != request_id:
+                raise RuntimeError(f"expected response {request_id}, got {response.get('id')}")
+        except Exception as exc:
+            # Replies can no longer be matched to requests; drop the worker and its pipe.
+            _stop_zk_worker()
+            raise RuntimeError(f"snarkjs worker protocol error: {exc}") from exc
+
+    if not response.get("ok"):
+        raise RuntimeError(f"snarkjs worker error: {response.get('error')}")
+    return response
+
+
 def generate_real_snarkjs_proof(credit_score: int, dti_bp: int) -> tuple[str, bool, str]:
-    """Generate and verify Groth16 proof with snarkjs; return (hash, verified, detail)."""
-    with tempfile.TemporaryDirectory(prefix="qp-zk-") as td:
+    """Generate and verify Groth16 proof with snarkjs; return (hash, verified, detail).
+
+    Uses the long-lived Node worker when available and falls back to the
+    snarkjs CLI if the worker cannot be started or fails.
+    """
+    input_payload = {
+        "creditScore": str(credit_score),
+        "debtToIncomeBp": str(dti_bp),
+    }
+
+    if not _zk_worker_disabled and zk_worker_available():
+        try:
+            response = _zk_worker_request({
+                "cmd": "prove",
+                "wasm": ZK_WASM_ARG,
+                "zkey": ZK_ZKEY_ARG,
+                "vkey": ZK_VKEY_ARG,
+                "input": input_payload,
+            })
+            proof_payload = response["proof"]
+            public_payload = response["public"]
+            proof_hash = stable_hash(f"groth16::{proof_payload}::{public_payload}")
+            detail = f"public={json.loads(public_payload)}"
+            return proof_hash, bool(response["verified"]), detail
+        except Exception as exc:
+            print(f"snarkjs worker unavailable, using CLI: {exc}")
+
+    with _zk_cli_slots:
+        return _generate_snarkjs_proof_cli(input_payload)
+
+
+def _generate_snarkjs_proof_cli(input_payload: dict[str, str]) -> tuple[str, bool, str]:
+    """Run wtns calculate / groth16 prove / groth16 verify as separate snarkjs processes."""
+    with tempfile.TemporaryDirectory(prefix="qp-zk-", dir=ZK_TMP_DIR) as td:
         temp_dir = Path(td)
         input_path = temp_dir / "input.json"
         witness_path = temp_dir / "witness.wtns"
         proof_path = temp_dir / "proof.json"
         public_path = temp_dir / "public.json"
 
-        input_payload = {
-            "creditScore": str(credit_score),
-            "debtToIncomeBp": str(dti_bp),
-        }
         input_path.write_text(json.dumps(input_payload), encoding="utf-8")
 
         run_cmd([
             "snarkjs",
             "wtns",
             "calculate",
-            str(ZK_WASM),
+            ZK_WASM_ARG,
             str(input_path),
             str(witness_path),
         ])
@@ -148,7 +381,7 @@ def generate_real_snarkjs_proof(credit_score: int, dti_bp: int) -> tuple[str, bo
             "snarkjs",
             "groth16",
             "prove",
-            str(ZK_ZKEY),
+            ZK_ZKEY_ARG,
             str(witness_path),
             str(proof_path),
             str(public_path),
@@ -158,7 +391,7 @@ def generate_real_snarkjs_proof(credit_score: int, dti_bp: int) -> tuple[str, bo
             "snarkjs",
             "groth16",
             "verify",
-            str(ZK_VKEY),
+            ZK_VKEY_ARG,
             str(public_path),
             str(proof_path),
         ])
@@ -184,33 +417,57 @@ class FHECompute:
 
         self.context = ts.context(
             ts.SCHEME_TYPE.CKKS,
-            poly_modulus_degree=8192,
+            poly_modulus_degree=FHE_POLY_MODULUS_DEGREE,
             coeff_mod_bit_sizes=[60, 40, 40, 60],
         )
         self.context.global_scale = 2**40
         self.context.generate_galois_keys()
 
-    def get_parameters(self) -> dict[str, Any]:
+    @staticmethod
+    def get_parameters() -> dict[str, Any]:
         return {
             "scheme": "CKKS",
-            "poly_modulus_degree": 8192,
+            "poly_modulus_degree": FHE_POLY_MODULUS_DEGREE,
             "security_level": "128-bit",
             "library": "Microsoft SEAL (via TenSEAL)",
             "real_zk_ready": real_zk_ready(),
         }
 
-    def encrypt_and_compute(self, sensitive_value: float) -> tuple[float, int]:
-        start = time.perf_counter()
-        encrypted = ts.ckks_vector(self.context, [sensitive_value])
+    def encrypt_and_compute(self, sensitive_value: float) -> tuple[float, int, int]:
+        results, encryption_time_ms, compute_time_ms = self.encrypt_and_compute_batch([sensitive_value])
+        return results[0], encryption_time_ms, compute_time_ms
+
+    def encrypt_and_compute_batch(self, sensitive_values: list[float]) -> tuple[list[float], int, int]:
+        """Pack values into the CKKS slots of one ciphertext and score them together.
+
+        Returns (results, encryption_time_ms, compute_time_ms).
+        """
+        if len(sensitive_values) > FHE_SLOT_COUNT:
+            raise ValueError(f"at most {FHE_SLOT_COUNT} values fit in one ciphertext")
+
+        enc_start = time.perf_counter()
+        encrypted = ts.ckks_vector(self.context, sensitive_values)
+        comp_start = time.perf_counter()
         encrypted_result = (encrypted - 300.0) * 0.18181818
-        compute_time_ms = int((time.perf_counter() - start) * 1000)
+        encryption_time_ms = int((comp_start - enc_start) * 1000)
+        compute_time_ms = int((time.perf_counter() - comp_start) * 1000)
+
+        decrypted = encrypted_result.decrypt()[: len(sensitive_values)]
+        results = [max(0.0, min(100.0, value)) for value in decrypted]
+        return results, encryption_time_ms, compute_time_ms
+
 
-        result = encrypted_result.decrypt()[0]
-        result = max(0.0, min(100.0, result))
-        return result, compute_time_ms
+@functools.lru_cache(maxsize=1)
+def get_fhe() -> FHECompute:
+    """Return the process-wide FHE context; key generation runs only once."""
+    return FHECompute()
 
 
-def perform_fhe_computation(sensitive_input: str, scenario: str) -> tuple[dict[str, Any], str, int, int]:
+def perform_fhe_computation(
+    sensitive_input: str,
+    scenario: str,
+    seed: Callable[[], int] | None = None,
+) -> tuple[dict[str, Any], str, int, int]:
     if not HAS_FHE:
         numeric_signal = int(stable_hash(sensitive_input + scenario)[:8], 16) % 100
         return {
@@ -221,12 +478,11 @@ def perform_fhe_computation(sensitive_input: str, scenario: str) -> tuple[dict[s
         }, "fallback-no-fhe", 0, 0
 
     try:
-        enc_start = time.perf_counter()
-        fhe = FHECompute()
-        encryption_time_ms = int((time.perf_counter() - enc_start) * 1000)
+        fhe = get_fhe()
 
-        numeric_value = (int(stable_hash(sensitive_input)[:8], 16) % 551) + 300
-        risk_score, compute_time_ms = fhe.encrypt_and_compute(float(numeric_value))
+        seed_value = seed() if seed is not None else input_seed(sensitive_input)
+        numeric_value = (seed_value % 551) + 300
+        risk_score, encryption_time_ms, compute_time_ms = fhe.encrypt_and_compute(float(numeric_value))
 
         return {
             "risk_reduction_percent": int(risk_score),
@@ -253,11 +509,13 @@ def build_proof_artifact(
     sensitive_input: str,
     scenario: str,
     fhe_parameters: dict[str, Any],
+    seed: Callable[[], int] | None = None,
+    loan_inputs: tuple[int, int] | None = None,
 ) -> tuple[ProofArtifact, int]:
     """Build proof artifact using real snarkjs if available, else simulated fallback."""
     start = time.perf_counter()
 
-    credit_score, dti_bp = derive_loan_inputs(sensitive_input, scenario)
+    credit_score, dti_bp = loan_inputs or derive_loan_inputs(sensitive_input, scenario, seed)
 
     if real_zk_ready():
         try:
@@ -271,7 +529,7 @@ def build_proof_artifact(
                 crypto_primitives_used=[
                     "FHE: CKKS (Microsoft SEAL)",
                     "Groth16 (Circom + snarkjs)",
-                    "SHA3-256 (quantum-resistant)",
+                    "SHA-256 (SHA-NI accelerated)",
                 ],
                 fhe_parameters={
                     **fhe_parameters,
@@ -306,7 +564,7 @@ def build_proof_artifact(
         crypto_primitives_used=[
             "FHE: CKKS (Microsoft SEAL)",
             "Verifiable computation layer (Circom/SNARK-compatible architecture)",
-            "SHA3-256 (quantum-resistant)",
+            "SHA-256 (SHA-NI accelerated)",
         ],
         fhe_parameters={
             **fhe_parameters,
@@ -317,27 +575,44 @@ def build_proof_artifact(
     return artifact, proof_time_ms
 
 
-def run_once(sensitive_input: str, scenario: str, force_fallback: bool) -> RunResult:
+def run_once(
+    sensitive_input: str | None,
+    scenario: str,
+    force_fallback: bool,
+    *,
+    loan_profile: LoanProfile | None = None,
+) -> RunResult:
+    """Run one private computation from a raw sensitive_input or a pre-parsed loan_profile."""
     total_start = time.perf_counter()
+    loan_inputs = None
+    if loan_profile is not None:
+        sensitive_input = loan_profile.canonical_input()
+        loan_inputs = loan_profile.circuit_inputs()
+    elif not sensitive_input:
+        raise ValueError("sensitive_input or loan_profile required")
+
     input_fingerprint = compute_input_fingerprint(sensitive_input)
+    # Hashed at most once, and only if the FHE path or the non-loan ZK fallback needs it.
+    seed = functools.cache(functools.partial(input_seed, sensitive_input))
 
-    compute_result, mode, enc_time, comp_time = perform_fhe_computation(sensitive_input, scenario)
+    compute_result, mode, enc_time, comp_time = perform_fhe_computation(sensitive_input, scenario, seed)
 
     if force_fallback or not HAS_FHE:
         fhe_params = {"enabled": False, "real_zk_ready": real_zk_ready()}
     else:
-        fhe = FHECompute() if HAS_FHE else None
-        fhe_params = fhe.get_parameters() if fhe else {"enabled": False}
+        fhe_params = FHECompute.get_parameters()
 
     proof, proof_time = build_proof_artifact(
         input_fingerprint=input_fingerprint,
         sensitive_input=sensitive_input,
         scenario=scenario,
         fhe_parameters=fhe_params,
+        seed=seed,
+        loan_inputs=loan_inputs,
     )
 
     total_runtime_ms = int((time.perf_counter() - total_start) * 1000)
-    run_id = f"run-{stable_hash(utc_now_iso())[:10]}"
+    run_id = f"run-{secrets.token_hex(5)}"
 
     if not proof.verification_result:
         raise RuntimeError("ZK proof verification failed")
@@ -363,7 +638,10 @@ def run_once(sensitive_input: str, scenario: str, force_fallback: bool) -> RunRe
 def export_json(result: RunResult, output_dir: Path) -> Path:
     output_dir.mkdir(parents=True, exist_ok=True)
     path = output_dir / f"{result.run_id}.json"
-    path.write_text(json.dumps(asdict(result), indent=2), encoding="utf-8")
+    if HAS_ORJSON:
+        path.write_bytes(orjson.dumps(result.to_dict(), option=orjson.OPT_INDENT_2))
+    else:
+        path.write_text(json.dumps(result.to_dict(), indent=2), encoding="utf-8")
     return path
 
 
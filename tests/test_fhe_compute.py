@@ -0,0 +1,19 @@
+import pytest
+
+pytest.importorskip("tenseal")
+
+from main import FHE_SLOT_COUNT, FHECompute  # noqa: E402
+
+
+def test_batch_returns_one_score_per_slot_in_order():
+    values = [300.0, 575.0, 850.0]
+
+    results, encryption_time_ms, compute_time_ms = FHECompute().encrypt_and_compute_batch(values)
+
+    assert results == pytest.approx([0.0, 50.0, 100.0], abs=0.01)
+    assert encryption_time_ms >= 0 and compute_time_ms >= 0
+
+
+def test_batch_rejects_more_values_than_slots():
+    with pytest.raises(ValueError):
+        FHECompute().encrypt_and_compute_batch([300.0] * (FHE_SLOT_COUNT + 1))
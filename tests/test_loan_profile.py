@@ -0,0 +1,51 @@
+import main
+from main import LoanProfile, parse_loan_profile, run_once
+
+
+def key_shape(value):
+    if isinstance(value, dict):
+        return {key: key_shape(item) for key, item in value.items()}
+    return type(value).__name__
+
+
+def capture_circuit_inputs(monkeypatch) -> list[tuple[int, int]]:
+    calls: list[tuple[int, int]] = []
+
+    def fake_proof(credit_score: int, dti_bp: int) -> tuple[str, bool, str]:
+        calls.append((credit_score, dti_bp))
+        return "0" * 64, True, "public=['1']"
+
+    monkeypatch.setattr(main, "real_zk_ready", lambda: True)
+    monkeypatch.setattr(main, "generate_real_snarkjs_proof", fake_proof)
+    return calls
+
+
+def test_loan_profile_circuit_inputs_are_clamped(monkeypatch):
+    calls = capture_circuit_inputs(monkeypatch)
+    profile = LoanProfile.from_values(900, 150.0, 95000.0, "home-loan")
+
+    result = run_once(None, "private-loan-preapproval", True, loan_profile=profile)
+
+    assert calls == [(850, 10000)]
+    assert result.proof.verification_result is True
+
+
+def test_loan_profile_and_string_input_share_result_shape(monkeypatch):
+    calls = capture_circuit_inputs(monkeypatch)
+    profile = LoanProfile.from_values(750, 32.0, 95000.0, "home-loan")
+
+    from_profile = run_once(None, "private-loan-preapproval", True, loan_profile=profile)
+    from_string = run_once("loan::750::32.00::95000.00::home-loan", "private-loan-preapproval", True)
+
+    assert calls == [(750, 3200), (750, 3200)]
+    assert key_shape(from_profile.to_dict()) == key_shape(from_string.to_dict())
+
+
+def test_dti_rounding_matches_previous_api_string_path():
+    for dti in (0.0, 1.115, 32.0, 32.005, 35.555, 99.999):
+        profile = LoanProfile.from_values(700, dti, 1.0, "general")
+        # The API used to serialize loan profiles this way before parsing them back.
+        legacy_input = f"loan::700::{dti:.2f}::1.00::general"
+        assert parse_loan_profile(legacy_input) == (700, profile.dti_bp)
+
+    assert LoanProfile.from_values(700, 1.115, 1.0, "general").dti_bp == 111
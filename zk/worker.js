@@ -0,0 +1,93 @@
+#!/usr/bin/env node
+// Long-lived Groth16 prover for app/main.py.
+//
+// On startup writes one line: {"ready": true} or {"ready": false, "error": "..."}.
+// Then reads newline-delimited JSON requests on stdin:
+//   {"id": 1, "cmd": "prove", "wasm": "...", "zkey": "...", "vkey": "...", "input": {...}}
+// and writes one JSON line per request on stdout, echoing the request id:
+//   {"id": 1, "ok": true, "proof": "<proof.json text>", "public": "<public.json text>", "verified": true}
+//   {"id": 1, "ok": false, "error": "..."}
+//
+// Loading snarkjs and the curve once per process avoids three Node cold
+// starts (wtns calculate / groth16 prove / groth16 verify) per proof.
+
+"use strict";
+
+const fs = require("fs");
+const path = require("path");
+const readline = require("readline");
+const { execSync } = require("child_process");
+
+function loadSnarkjs() {
+  try {
+    return require("snarkjs");
+  } catch (err) {
+    // snarkjs is usually installed globally (npm install -g snarkjs).
+    const globalRoot = execSync("npm root -g", { encoding: "utf8", stdio: ["ignore", "pipe", "ignore"] }).trim();
+    return require(path.join(globalRoot, "snarkjs"));
+  }
+}
+
+let snarkjs;
+try {
+  snarkjs = loadSnarkjs();
+} catch (err) {
+  process.stdout.write(JSON.stringify({ ready: false, error: String((err && err.message) || err) }) + "\n");
+  process.exit(1);
+}
+process.stdout.write(JSON.stringify({ ready: true }) + "\n");
+
+const vkeyCache = new Map();
+
+function loadVkey(vkeyPath) {
+  if (!vkeyCache.has(vkeyPath)) {
+    vkeyCache.set(vkeyPath, JSON.parse(fs.readFileSync(vkeyPath, "utf8")));
+  }
+  return vkeyCache.get(vkeyPath);
+}
+
+async function handle(request) {
+  if (request.cmd !== "prove") {
+    throw new Error(`unknown cmd: ${request.cmd}`);
+  }
+  const { proof, publicSignals } = await snarkjs.groth16.fullProve(
+    request.input,
+    request.wasm,
+    request.zkey,
+  );
+  const verified = await snarkjs.groth16.verify(loadVkey(request.vkey), publicSignals, proof);
+  return {
+    ok: true,
+    // Same layout snarkjs CLI writes to proof.json / public.json.
+    proof: JSON.stringify(proof, null, 1),
+    public: JSON.stringify(publicSignals, null, 1),
+    verified,
+  };
+}
+
+const rl = readline.createInterface({ input: process.stdin, terminal: false });
+let queue = Promise.resolve();
+
+rl.on("line", (line) => {
+  if (!line.trim()) {
+    return;
+  }
+  // Answer strictly in request order.
+  queue = queue.then(async () => {
+    let id = null;
+    let response;
+    try {
+      const request = JSON.parse(line);
+      id = request.id === undefined ? null : request.id;
+      response = await handle(request);
+    } catch (err) {
+      response = { ok: false, error: String((err && err.message) || err) };
+    }
+    response.id = id;
+    process.stdout.write(JSON.stringify(response) + "\n");
+  });
+});
+
+rl.on("close", () => {
+  queue.then(() => process.exit(0));
+});